@@ -6,18 +6,429 @@ applies resizing and filtering based on configuration options, and saves them
 into the designated crop folder.
 """
 
+import hashlib
+import json
+import multiprocessing
 import os
-from PIL import Image, ImageFilter
+import queue
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
+from PIL import Image, ImageFilter, JpegImagePlugin
 
-def crop_images(source_folder: str, crop_folder: str, config) -> None:
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+try:
+    from turbojpeg import TurboJPEG
+    _turbojpeg = TurboJPEG()
+except (ImportError, OSError, RuntimeError):
+    _turbojpeg = None
+
+try:
+    import pyvips
+except (ImportError, OSError):
+    pyvips = None
+
+# File extensions the cropper picks up.
+IMG_EXTS = (".gif", ".jpg", ".jpeg", ".png")
+
+# Built Color3DLUT filters, keyed by (cube path, mtime).
+_LUT_CACHE = {}
+
+# Sharpening applied after large downscales.
+_UNSHARP = ImageFilter.UnsharpMask(1, 20, 8)
+
+# MCU (width, height) per Pillow JPEG subsampling code.
+_JPEG_MCU_SIZES = {0: (8, 8), 1: (16, 8), 2: (16, 16)}
+
+# Full-chroma, single-pass JPEG encoding for print-quality crops.
+_JPEG_SAVE_OPTIONS = {"quality": 98, "subsampling": 0, "optimize": False, "progressive": False}
+
+# Width of the previews handed back to the GUI.
+PREVIEW_WIDTH = 150
+
+# The LUT and backend of a process pool worker, set once by _init_worker.
+_WORKER_LUT = None
+_WORKER_VIPS = False
+
+
+def _build_lut(cube_path: str) -> ImageFilter.Color3DLUT:
+    """
+    Build a Color3DLUT filter from a .CUBE file.
+
+    Parameters:
+        cube_path (str): Path to the .CUBE file.
+
+    Returns:
+        ImageFilter.Color3DLUT: The filter described by the file.
+    """
+    lut_table = np.loadtxt(cube_path, skiprows=11, dtype=np.float32)
+    lsize = round(lut_table.shape[0] ** (1/3))
+    return ImageFilter.Color3DLUT(lsize, lut_table)
+
+
+def _lossless_crop(im: Image.Image, c: int) -> bytes | None:
+    """
+    Crop c pixels off every side of a JPEG without decoding or re-encoding it.
+
+    Parameters:
+        im (Image.Image): The opened source image.
+        c (int): The margin to crop, in pixels.
+
+    Returns:
+        bytes | None: The cropped JPEG data, or None if libjpeg-turbo is not
+        available, the image is not a JPEG, or the crop origin does not fall
+        on an MCU boundary.
+    """
+    if _turbojpeg is None or im.format != "JPEG":
+        return None
+    mcu = _JPEG_MCU_SIZES.get(JpegImagePlugin.get_sampling(im))
+    if mcu is None or c % mcu[0] or c % mcu[1]:
+        return None
+    w, h = im.size
+    with open(im.filename, "rb") as fp:
+        return _turbojpeg.crop(fp.read(), c, c, w - 2 * c, h - 2 * c)
+
+
+def _unsharp(im: Image.Image) -> Image.Image:
+    """
+    Apply an UnsharpMask(1, 20, 8), blurring with OpenCV's vectorized
+    Gaussian when it is installed and falling back to Pillow otherwise.
+
+    Parameters:
+        im (Image.Image): The image to sharpen.
+
+    Returns:
+        Image.Image: The sharpened image.
+    """
+    if cv2 is None or im.mode not in ("L", "RGB"):
+        return im.filter(_UNSHARP)
+    src = np.asarray(im)
+    diff = src.astype(np.int16) - cv2.GaussianBlur(src, (0, 0), 1)
+    out = np.where(np.abs(diff) >= 8, src + (diff * 20 / 100).astype(np.int16), src)
+    return Image.fromarray(np.clip(out, 0, 255).astype(np.uint8))
+
+
+def _process_vips(src_path: str, max_dpi: int) -> bytes:
+    """
+    Crop, scale and sharpen an image as a single streamed libvips pipeline,
+    following the same steps as the Pillow path in _process_image. Nothing is
+    computed until the result is encoded, and then only a few scanlines are
+    held in memory at a time.
+
+    Parameters:
+        src_path (str): Path of a JPEG or PNG source image.
+        max_dpi (int): Resolution above which the crop is downscaled.
+
+    Returns:
+        bytes: The processed image, encoded in the source's format.
+    """
+    is_png = src_path.lower().endswith(".png")
+    options = {"access": "sequential"}
+    if not is_png:
+        # Only the header is read here; pixels are decoded once, below
+        header = pyvips.Image.new_from_file(src_path)
+        dpi = min(header.width / 2.72, header.height / 3.7)
+        # Like the Pillow draft, let libjpeg shrink while decoding, keeping
+        # 2x headroom over the final size for the resize below
+        options["shrink"] = next((n for n in (8, 4, 2) if n <= dpi / (2 * max_dpi)), 1)
+    im = pyvips.Image.new_from_file(src_path, **options)
+    if im.format != "uchar":
+        # 16-bit PNGs: scale to 8 bits up front, as Pillow does when it opens
+        # them, rather than letting the final cast clip them
+        im = im.colourspace("b-w" if im.bands <= 2 else "srgb")
+    c = round(0.12 * min(im.width / 2.72, im.height / 3.7))
+    dpi = c * (1 / 0.12)
+    im = im.crop(c, c, im.width - 2 * c, im.height - 2 * c)
+    ratio = dpi / max_dpi
+    if ratio > 1.0:
+        new_w = round(im.width * max_dpi / dpi)
+        new_h = round(im.height * max_dpi / dpi)
+        im = im.resize(new_w / im.width, vscale=new_h / im.height, kernel="cubic")
+    if ratio > 1.3:
+        # UnsharpMask(1, 20, 8): add 20% of the detail wherever it reaches 8 levels
+        diff = im - im.gaussblur(1)
+        im = (abs(diff) >= 8).ifthenelse(im + diff * 0.2, im).cast("uchar")
+    if is_png:
+        # Adaptive row filters, as Pillow uses; unfiltered rows compress far worse
+        return im.write_to_buffer(".png", filter="all")
+    return im.write_to_buffer(".jpg", Q=_JPEG_SAVE_OPTIONS["quality"], subsample_mode="off")
+
+
+def _process_image(src_path: str, max_dpi: int, lut, vips: bool = False) -> Image.Image | bytes:
+    """
+    Crop the bleed edge off an image and scale, sharpen and color it for print.
+
+    Parameters:
+        src_path (str): Path of the source image.
+        max_dpi (int): Resolution above which the crop is downscaled.
+        lut: A Color3DLUT to apply, or None.
+        vips (bool): Process JPEGs and PNGs with libvips when no LUT is applied.
+
+    Returns:
+        Image.Image | bytes: The processed image, or already encoded data when
+        the image was cropped losslessly or processed with libvips.
+    """
+    if vips and pyvips is not None and lut is None and src_path.lower().endswith((".jpg", ".jpeg", ".png")):
+        return _process_vips(src_path, max_dpi)
+    with Image.open(src_path) as im:
+        w, h = im.size
+        dpi = min(w / 2.72, h / 3.7)
+        if dpi > max_dpi and im.format == "JPEG":
+            # Let libjpeg decode straight to a reduced scale, keeping
+            # 2x headroom over the final size for the resize below
+            scale = 2 * max_dpi / dpi
+            im.draft("RGB", (round(w * scale), round(h * scale)))
+            w, h = im.size
+        c = round(0.12 * min(w / 2.72, h / 3.7))
+        dpi = c * (1 / 0.12)
+        if lut is None and dpi <= max_dpi:
+            data = _lossless_crop(im, c)
+            if data is not None:
+                return data
+        crop_im = im.crop((c, c, w - c, h - c))
+    ratio = dpi / max_dpi
+    if ratio > 1.0:
+        new_w = round(crop_im.size[0] * max_dpi / dpi)
+        new_h = round(crop_im.size[1] * max_dpi / dpi)
+        crop_im = crop_im.resize((new_w, new_h), Image.Resampling.BICUBIC)
+    # Near-unity downscales barely soften, so only sharpen larger ones
+    if ratio > 1.3:
+        crop_im = _unsharp(crop_im)
+    if lut:
+        crop_im = crop_im.filter(lut)
+    return crop_im
+
+
+def _preview(img: Image.Image | bytes) -> bytes:
+    """
+    Encode a small preview of a processed image, so the GUI does not have to
+    decode the freshly written crop again.
+
+    Parameters:
+        img (Image.Image | bytes): The image, or already encoded data.
+
+    Returns:
+        bytes: A PREVIEW_WIDTH pixel wide JPEG.
+    """
+    if isinstance(img, bytes):
+        img = Image.open(BytesIO(img))
+        img.draft("RGB", (2 * PREVIEW_WIDTH, 2 * PREVIEW_WIDTH))
+    else:
+        img = img.copy()
+    img.thumbnail((PREVIEW_WIDTH, 10_000), Image.Resampling.LANCZOS, reducing_gap=2.0)
+    buf = BytesIO()
+    img.convert("RGB").save(buf, "JPEG", quality=90)
+    return buf.getvalue()
+
+
+def _save_atomic(img: Image.Image | bytes, target_path: str) -> None:
+    """
+    Save a processed image next to its target and rename it into place, so an
+    interrupted save never leaves a partial crop that looks up to date.
+
+    Parameters:
+        img (Image.Image | bytes): The image, or data already encoded in the
+            target's format.
+        target_path (str): Where the crop should end up.
+    """
+    ext = os.path.splitext(target_path)[1].lower()
+    tmp_path = target_path + ".tmp"
+    try:
+        with open(tmp_path, "wb", buffering=1 << 20) as fp:
+            if isinstance(img, bytes):
+                fp.write(img)
+            elif ext in (".jpg", ".jpeg"):
+                img.save(fp, "JPEG", **_JPEG_SAVE_OPTIONS)
+            else:
+                img.save(fp, Image.registered_extensions()[ext])
+        os.replace(tmp_path, target_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _init_worker(lut, vips: bool) -> None:
+    """
+    Store the LUT and backend in a process pool worker, so they are sent once
+    per worker rather than with every task.
+
+    Parameters:
+        lut: A Color3DLUT to apply, or None.
+        vips (bool): Whether to process images with libvips where possible.
+    """
+    global _WORKER_LUT, _WORKER_VIPS
+    _WORKER_LUT = lut
+    _WORKER_VIPS = vips
+
+
+def _crop_one(task: tuple) -> tuple | None:
+    """
+    Process and save a single image; the unit of work of the process pool.
+
+    Parameters:
+        task (tuple): The source path, target path and max DPI.
+
+    Returns:
+        tuple | None: The crop's file name and preview (None if only the
+        preview failed), or None if the crop failed.
+    """
+    src_path, target_path, max_dpi = task
+    try:
+        img = _process_image(src_path, max_dpi, _WORKER_LUT, _WORKER_VIPS)
+        _save_atomic(img, target_path)
+    except Exception as e:
+        print(f"Error processing {os.path.basename(src_path)}: {e}")
+        return None
+    try:
+        preview = _preview(img)
+    except Exception:
+        # The crop itself is fine; the GUI makes its own preview instead
+        preview = None
+    return os.path.basename(target_path), preview
+
+
+def _crop_key(entry: os.DirEntry, max_dpi: int, lut) -> str:
+    """
+    Summarize a source file and the settings that shape its crop.
+
+    Parameters:
+        entry (os.DirEntry): The source image.
+        max_dpi (int): Resolution above which the crop is downscaled.
+        lut: The Color3DLUT applied, or None.
+
+    Returns:
+        str: A key that changes whenever the crop would come out differently.
+    """
+    st = entry.stat()
+    return hashlib.blake2b(f"{st.st_mtime_ns}:{st.st_size}:{max_dpi}:{lut is not None}".encode(),
+                           digest_size=16).hexdigest()
+
+
+def _load_crop_cache(cache_path: str | None) -> dict:
+    """
+    Read the source key of every crop written by earlier runs.
+
+    Parameters:
+        cache_path (str | None): Path of the JSON cache, or None for no cache.
+
+    Returns:
+        dict: The cached key of each source file name.
+    """
+    if cache_path is None:
+        return {}
+    try:
+        with open(cache_path, "r") as fp:
+            return json.load(fp)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_crop_cache(cache_path: str, cache: dict) -> None:
+    """
+    Atomically write the crop cache.
+
+    Parameters:
+        cache_path (str): Path of the JSON cache.
+        cache (dict): The key of each source file name.
+    """
+    tmp_path = cache_path + ".tmp"
+    with open(tmp_path, "w") as fp:
+        json.dump(cache, fp, separators=(",", ":"))
+    os.replace(tmp_path, cache_path)
+
+
+def _run_crops(pending: list, max_dpi: int, lut, vips: bool, workers: int, processes: bool) -> dict:
+    """
+    Process and save every pending image.
+
+    Parameters:
+        pending (list): The (source path, target path) of each image to crop.
+        max_dpi (int): Resolution above which crops are downscaled.
+        lut: A Color3DLUT to apply, or None.
+        vips (bool): Whether to process images with libvips where possible.
+        workers (int): How many images to process at once.
+        processes (bool): Use a process pool instead of the thread pipeline.
+
+    Returns:
+        dict: The file name of every crop written, mapped to its preview or
+        None if the preview could not be made.
+    """
+    if processes:
+        tasks = [(src_path, target_path, max_dpi) for src_path, target_path in pending]
+        # Forking once libvips has started its worker threads deadlocks the
+        # children, so vips runs get freshly spawned workers
+        context = multiprocessing.get_context("spawn") if vips and pyvips is not None else None
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=_init_worker, initargs=(lut, vips)) as ex:
+            return dict(result for result in ex.map(_crop_one, tasks, chunksize=4) if result)
+
+    encode_queue = queue.Queue(maxsize=2 * workers)
+    previews = {}
+
+    def decode(paths: tuple) -> None:
+        src_path, target_path = paths
+        try:
+            encode_queue.put((target_path, _process_image(src_path, max_dpi, lut, vips)))
+        except Exception as e:
+            print(f"Error processing {os.path.basename(src_path)}: {e}")
+
+    def encode() -> None:
+        while True:
+            item = encode_queue.get()
+            if item is None:
+                return
+            target_path, img = item
+            try:
+                _save_atomic(img, target_path)
+            except Exception as e:
+                print(f"Error saving {os.path.basename(target_path)}: {e}")
+                continue
+            try:
+                previews[os.path.basename(target_path)] = _preview(img)
+            except Exception:
+                # The crop itself is fine; the GUI makes its own preview instead
+                previews[os.path.basename(target_path)] = None
+
+    with ThreadPoolExecutor(max_workers=workers) as encoders:
+        for _ in range(workers):
+            encoders.submit(encode)
+        with ThreadPoolExecutor(max_workers=workers) as decoders:
+            list(decoders.map(decode, pending))
+        # One sentinel per encoder once every image has been queued
+        for _ in range(workers):
+            encode_queue.put(None)
+    return previews
+
+
+def crop_images(source_folder: str, crop_folder: str, config, cache_path: str | None = None) -> dict:
     """
     Crop and process images from the source folder to the crop folder,
     applying a vibrance filter if enabled in the configuration.
 
+    By default images are processed by two thread pools joined by a bounded
+    queue: one decodes, crops and filters, the other encodes and writes the
+    results, so disk writes overlap with decoding. Pillow releases the GIL for
+    this work. With Crop.Processes enabled, each image is instead processed
+    end to end on a process pool. With Crop.Vips enabled and pyvips installed,
+    JPEGs and PNGs are processed by libvips unless the vibrance LUT is on.
+
     Parameters:
         source_folder (str): Folder containing the original images.
         crop_folder (str): Folder where the cropped images will be saved.
         config: A configparser object containing configuration options.
+        cache_path (str | None): JSON file remembering which source file and
+            settings each crop was made from. Without it, a crop is redone only
+            when its source is newer.
+
+    Returns:
+        dict: The file name of every crop written by this run, mapped to a
+        JPEG preview PREVIEW_WIDTH pixels wide, or None if the preview could
+        not be made.
     """
     if not os.path.exists(crop_folder):
         os.mkdir(crop_folder)
@@ -26,39 +437,51 @@ def crop_images(source_folder: str, crop_folder: str, config) -> None:
     if config.getboolean("Vibrance.Bump", fallback=False):
         try:
             cube_path = os.path.join(os.path.dirname(__file__), "vibrance.CUBE")
-            with open(cube_path) as f:
-                lut_raw = f.read().splitlines()[11:]
-            lsize = round(len(lut_raw) ** (1/3))
-            def row2val(row: str):
-                return tuple(float(val) for val in row.split())
-            lut_table = [row2val(row) for row in lut_raw]
-            lut = ImageFilter.Color3DLUT(lsize, lut_table)
+            key = (cube_path, os.path.getmtime(cube_path))
+            lut = _LUT_CACHE.get(key)
+            if lut is None:
+                lut = _LUT_CACHE.setdefault(key, _build_lut(cube_path))
         except Exception:
             lut = None
     else:
         lut = None
 
-    for img_file in os.listdir(source_folder):
-        ext = os.path.splitext(img_file)[1].lower()
-        if ext not in [".gif", ".jpg", ".jpeg", ".png"]:
-            continue
-        target_path = os.path.join(crop_folder, img_file)
-        if os.path.exists(target_path):
-            continue
+    max_dpi = config.getint("Max.DPI", fallback=300)
+    vips = config.getboolean("Crop.Vips", fallback=False)
+    # Leave a core free so the GUI thread stays responsive; 0 means automatic
+    workers = config.getint("Crop.Workers", fallback=0)
+    if workers <= 0:
+        workers = max(1, min((os.cpu_count() or 1) - 1, 4))
+
+    with os.scandir(source_folder) as it:
+        entries = [entry for entry in it if entry.is_file() and entry.name.lower().endswith(IMG_EXTS)]
+    with os.scandir(crop_folder) as it:
+        existing = {entry.name: entry.stat().st_mtime for entry in it if entry.is_file()}
+    cache = _load_crop_cache(cache_path)
+    keys = {entry.name: _crop_key(entry, max_dpi, lut) for entry in entries}
+    pending = []
+    for entry in entries:
+        if entry.name in existing:
+            if entry.name in cache:
+                # Redo the crop if the source or the crop settings changed
+                if cache[entry.name] == keys[entry.name]:
+                    continue
+            # Crops from before the cache existed: skip if at least as new as the source
+            elif existing[entry.name] >= entry.stat().st_mtime:
+                continue
+        pending.append((entry.path, os.path.join(crop_folder, entry.name)))
+
+    previews = _run_crops(pending, max_dpi, lut, vips, workers,
+                          config.getboolean("Crop.Processes", fallback=False))
+
+    if cache_path is not None:
+        # Record every crop that is now up to date, dropping failed ones and
+        # sources that are gone
+        failed = {os.path.basename(target_path) for _, target_path in pending} - set(previews)
         try:
-            with Image.open(os.path.join(source_folder, img_file)) as im:
-                w, h = im.size
-                c = round(0.12 * min(w / 2.72, h / 3.7))
-                dpi = c * (1 / 0.12)
-                crop_im = im.crop((c, c, w - c, h - c))
-                max_dpi = config.getint("Max.DPI", fallback=300)
-                if dpi > max_dpi:
-                    new_w = int(round(crop_im.size[0] * max_dpi / dpi))
-                    new_h = int(round(crop_im.size[1] * max_dpi / dpi))
-                    crop_im = crop_im.resize((new_w, new_h), Image.Resampling.BICUBIC)
-                    crop_im = crop_im.filter(ImageFilter.UnsharpMask(1, 20, 8))
-                if lut:
-                    crop_im = crop_im.filter(lut)
-                crop_im.save(target_path, quality=98)
-        except Exception as e:
-            print(f"Error processing {img_file}: {e}")
+            _write_crop_cache(cache_path, {name: key for name, key in keys.items() if name not in failed})
+        except OSError as e:
+            # The crops are written either way; the next run just redoes more work
+            print(f"Error saving crop cache: {e}")
+    return previews
+
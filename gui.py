@@ -7,15 +7,31 @@ user interface, configuration management, and calls to image cropping and PDF ge
 
 import os
 import json
+import hashlib
 import configparser
-import subprocess
 import re
+import queue
+import threading
+from io import BytesIO
 import tkinter as tk
 from tkinter import messagebox
 from PIL import Image, ImageTk, ImageFilter
 from reportlab.lib.pagesizes import letter, A4, legal
-from pdf_utils import pdf_gen, show_popup
-from cropper import crop_images
+from pdf_utils import open_file, pdf_gen, show_popup
+from cropper import crop_images, IMG_EXTS, PREVIEW_WIDTH
+
+try:
+    import orjson
+
+    _loads = orjson.loads
+
+    def _dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+except ImportError:
+    _loads = json.loads
+
+    def _dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode()
 
 
 class PDFProxyPrinter:
@@ -23,6 +39,10 @@ class PDFProxyPrinter:
     A GUI application to manage and print PDFs from card images.
     """
 
+    SIZE_MAP = {"Letter": letter, "A4": A4, "Legal": legal}
+    # Size of a card preview tile on the canvas, in pixels
+    TILE_W, TILE_H = 170, 280
+
     def __init__(self, master: tk.Tk) -> None:
         self.master = master
         self.cwd = os.path.dirname(__file__)
@@ -31,16 +51,33 @@ class PDFProxyPrinter:
         self.print_json = os.path.join(self.cwd, "print.json")
         self.img_cache = os.path.join(self.cwd, "img.cache")
 
-        self.ensure_directories([self.image_dir, self.crop_dir])
+        if os.path.isfile(self.img_cache):
+            # Older versions kept the cache in a single file; its contents are
+            # regenerated, so make way for the thumbnail folder
+            try:
+                os.remove(self.img_cache)
+            except OSError:
+                pass
+        self.ensure_directories([self.image_dir, self.crop_dir, self.img_cache])
         self.config = configparser.ConfigParser()
-        self.open_config_file(os.path.join(self.cwd, "config.ini"))
+        self.config.read(os.path.join(self.cwd, "config.ini"))
         self.cfg = self.config["DEFAULT"]
 
         self.img_dict = {}
+        self._crop_listing = (None, {})
         self.print_dict = self.load_project_configuration()
         self.card_vars = {}
+        self._card_widgets = {}
+        self._tile_seq = 0
+        self._wheel_delta = 0
+        self._wheel_after = None
+        self._thumb_cache = {}
+        self._save_after = None
+        self._last_save_hash = None
 
         self.setup_ui()
+        self.prune_thumbnails()
+        self.master.protocol("WM_DELETE_WINDOW", self.on_close)
 
     def ensure_directories(self, directories: list) -> None:
         """
@@ -50,21 +87,15 @@ class PDFProxyPrinter:
             if not os.path.exists(folder):
                 os.mkdir(folder)
 
-    def open_config_file(self, filepath: str) -> None:
-        """
-        Open the configuration file with the system's default editor.
-        """
-        subprocess.Popen(["xdg-open", filepath])
-
     def load_project_configuration(self) -> dict:
         """
         Load the project configuration from a JSON file or initialize a new project.
         """
         if os.path.exists(self.print_json):
-            with open(self.print_json, "r") as fp:
-                print_dict = json.load(fp)
+            with open(self.print_json, "rb") as fp:
+                print_dict = _loads(fp.read())
             # Add new images from the crop directory to the project
-            for img in os.listdir(self.crop_dir):
+            for img in self.scan_crops():
                 if img not in print_dict["cards"]:
                     print_dict["cards"][img] = 1
         else:
@@ -77,10 +108,28 @@ class PDFProxyPrinter:
                 "orient": "Portrait",
                 "filename": "_printme",
             }
-            for img in os.listdir(self.crop_dir):
+            for img in self.scan_crops():
                 print_dict["cards"][img] = 1
         return print_dict
 
+    def scan_crops(self) -> dict:
+        """
+        Map the file name of every cropped image to its modification time.
+
+        The listing is cached until the crop folder's own mtime changes, which
+        happens whenever the cropper adds or replaces a crop.
+        """
+        dir_mtime = os.stat(self.crop_dir).st_mtime_ns
+        if self._crop_listing[0] != dir_mtime:
+            with os.scandir(self.crop_dir) as it:
+                crops = {
+                    entry.name: entry.stat().st_mtime
+                    for entry in it
+                    if entry.is_file() and entry.name.lower().endswith(IMG_EXTS)
+                }
+            self._crop_listing = (dir_mtime, crops)
+        return self._crop_listing[1]
+
     def setup_ui(self) -> None:
         """
         Set up the user interface components.
@@ -124,108 +173,252 @@ class PDFProxyPrinter:
 
     def setup_scrollable_frame(self) -> None:
         """
-        Set up the scrollable frame used to display card previews.
+        Set up the scrollable canvas the card previews are drawn on.
         """
-        self.scroll_canvas = tk.Canvas(self.master, borderwidth=0)
-        self.frame_cards = tk.Frame(self.scroll_canvas)
+        self.scroll_canvas = tk.Canvas(self.master, borderwidth=0, highlightthickness=0)
         vsb = tk.Scrollbar(self.master, orient="vertical", command=self.scroll_canvas.yview)
         self.scroll_canvas.configure(yscrollcommand=vsb.set)
         vsb.pack(side="right", fill="y")
         self.scroll_canvas.pack(side="left", fill="both", expand=True)
-        self.scroll_canvas.create_window((4, 4), window=self.frame_cards, anchor="nw", tags="self.frame_cards")
-        self.frame_cards.bind("<Configure>", self.on_frame_configure)
+        # Windows and macOS report <MouseWheel>, X11 reports buttons 4 and 5
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.master.bind_all(sequence, self.on_mousewheel)
         self.refresh_cards()
 
-    def on_frame_configure(self, event: tk.Event) -> None:
+    def on_mousewheel(self, event: tk.Event) -> None:
+        """
+        Accumulate mouse wheel movement so a burst of wheel events scrolls the
+        canvas once per idle cycle instead of redrawing for each event.
+        """
+        if event.num == 4:
+            self._wheel_delta += 120
+        elif event.num == 5:
+            self._wheel_delta -= 120
+        else:
+            self._wheel_delta += event.delta
+        if self._wheel_after is None:
+            self._wheel_after = self.master.after_idle(self.apply_mousewheel)
+
+    def apply_mousewheel(self) -> None:
         """
-        Reset the scroll region of the canvas to encompass the inner frame.
+        Scroll the canvas by the wheel movement accumulated since the last idle cycle.
         """
-        self.scroll_canvas.configure(scrollregion=self.scroll_canvas.bbox("all"))
+        self._wheel_after = None
+        delta, self._wheel_delta = self._wheel_delta, 0
+        if delta:
+            # macOS reports single steps rather than multiples of 120
+            units = int(-delta / 120) or (-1 if delta > 0 else 1)
+            self.scroll_canvas.yview_scroll(units, "units")
 
     def refresh_cards(self) -> None:
         """
-        Refresh the card preview area by recreating the card widgets.
+        Refresh the card preview area, only drawing or deleting the tiles of
+        cards that were added or removed since the last refresh. Tiles of crops
+        that were redone keep their canvas items and just get the new preview.
         """
-        for widget in self.frame_cards.winfo_children():
-            widget.destroy()
-        self.card_vars.clear()
+        crops = self.scan_crops()
+        cards = {}
+        for card, count in self.print_dict.get("cards", {}).items():
+            if card in crops:
+                cards[card] = (count, crops[card])
+
+        for card in set(self._card_widgets) - set(cards):
+            tile = self._card_widgets.pop(card)
+            self.scroll_canvas.delete(tile["tag"])
+            tile["entry"].destroy()
+            del self.card_vars[card]
 
         col_count = self.print_dict.get("columns", 5)
-        row = 0
-        col = 0
-        for card, count in self.print_dict.get("cards", {}).items():
-            card_path = os.path.join(self.crop_dir, card)
-            if not os.path.exists(card_path):
+        for i, (card, (count, mtime)) in enumerate(cards.items()):
+            row, col = divmod(i, col_count)
+            pos = (col * self.TILE_W, row * self.TILE_H)
+            tile = self._card_widgets.get(card)
+            if tile is None:
+                self._card_widgets[card] = self.create_card_widget(card, count, mtime, pos)
                 continue
+            self.card_vars[card].set(count)
+            if tile["mtime"] != mtime:
+                # The crop was redone, so swap in its new preview
+                tile["photo"] = self.tile_photo(card, mtime)
+                tile["mtime"] = mtime
+                self.scroll_canvas.itemconfigure(tile["image"], image=tile["photo"] or "")
+            if tile["pos"] != pos:
+                self.scroll_canvas.move(tile["tag"], pos[0] - tile["pos"][0], pos[1] - tile["pos"][1])
+                tile["pos"] = pos
+
+        rows = -(-len(cards) // col_count)
+        self.scroll_canvas.configure(scrollregion=(0, 0, col_count * self.TILE_W, rows * self.TILE_H))
+
+        # Drop previews of removed cards and of crops that have been redone
+        self._thumb_cache = {
+            key: photo for key, photo in self._thumb_cache.items()
+            if key[0] in cards and key[1] == cards[key[0]][1]
+        }
+
+    def create_card_widget(self, card: str, count: int, mtime: float, pos: tuple) -> dict:
+        """
+        Draw the preview tile of a single card onto the canvas with its top left
+        corner at pos. Left and right clicks on the image add and remove a copy.
+        """
+        canvas = self.scroll_canvas
+        # Canvas tag expressions treat characters like "!" or "&&" specially,
+        # so tiles are tagged with a generated name rather than the file name
+        self._tile_seq += 1
+        tag = f"tile{self._tile_seq}"
+        x0, y0 = pos
+        cx = x0 + self.TILE_W / 2
+
+        canvas.create_rectangle(x0 + 5, y0 + 5, x0 + self.TILE_W - 5, y0 + self.TILE_H - 5,
+                                outline="gray", tags=(tag,))
+        photo = self.tile_photo(card, mtime)
+        image_id = canvas.create_image(cx, y0 + 12, image=photo or "", anchor="n", tags=(tag,))
+        canvas.tag_bind(image_id, "<Button-1>", lambda e, c=card: self.update_card_count(c, 1))
+        canvas.tag_bind(image_id, "<Button-3>", lambda e, c=card: self.update_card_count(c, -1))
+
+        display_name = card if len(card) < 35 else card[:28] + "..." + card[card.rfind('.')-1:]
+        canvas.create_text(cx, y0 + 236, text=display_name, width=self.TILE_W - 14, tags=(tag,))
+
+        var = tk.IntVar(value=count)
+        var.trace_add("write", lambda *_, c=card: self.on_count_changed(c))
+        self.card_vars[card] = var
+        for dx, text, delta in ((-40, "-", -1), (40, "+", 1)):
+            btn_tag = f"{tag}{text}"
+            canvas.create_rectangle(cx + dx - 11, y0 + 249, cx + dx + 11, y0 + 271,
+                                    fill="#e0e0e0", outline="gray", tags=(tag, btn_tag))
+            canvas.create_text(cx + dx, y0 + 260, text=text, tags=(tag, btn_tag))
+            canvas.tag_bind(btn_tag, "<Button-1>", lambda e, c=card, d=delta: self.update_card_count(c, d))
+        entry_count = tk.Entry(canvas, textvariable=var, width=3, justify='center')
+        canvas.create_window(cx, y0 + 260, window=entry_count, tags=(tag,))
+        # Keep a reference to the photo, the canvas item alone does not
+        return {"tag": tag, "pos": pos, "mtime": mtime, "image": image_id, "entry": entry_count, "photo": photo}
+
+    def tile_photo(self, card: str, mtime: float) -> ImageTk.PhotoImage | None:
+        """
+        Return the preview shown on a card's tile, or None if it cannot be loaded.
+        """
+        try:
+            return self.thumbnail_photo(card, mtime)
+        except Exception:
+            return None
 
-            card_frame = tk.Frame(self.frame_cards, bd=2, relief=tk.RIDGE, padx=5, pady=5)
-            card_frame.grid(row=row, column=col, padx=5, pady=5, sticky="nsew")
+    def thumbnail_path(self, card: str, mtime: float) -> str:
+        """
+        Return where the cached preview of a card version lives in the image cache.
+        """
+        palette = self.cfg.getboolean("Thumb.Palette", fallback=False)
+        digest = hashlib.blake2b(card.encode(), digest_size=8).hexdigest()
+        return os.path.join(self.img_cache, f"{digest}_{int(mtime)}{'_p' if palette else ''}.png")
 
+    def store_thumbnail(self, card: str, mtime: float, img: Image.Image) -> Image.Image:
+        """
+        Write the preview of a card version into the image cache. The preview
+        is returned even if it cannot be written.
+        """
+        if self.cfg.getboolean("Thumb.Palette", fallback=False):
+            # 8-bit palette thumbnails are a quarter of the size on disk
+            img = img.quantize(256)
+        thumb_path = self.thumbnail_path(card, mtime)
+        tmp_path = thumb_path + ".tmp"
+        try:
+            img.save(tmp_path, "PNG")
+            os.replace(tmp_path, thumb_path)
+        except OSError:
             try:
-                img = Image.open(card_path)
-                w, h = img.size
-                new_w = 150
-                new_h = int(h * (150 / w))
-                img = img.resize((new_w, new_h), Image.Resampling.LANCZOS)
-                photo = ImageTk.PhotoImage(img)
-            except Exception:
-                photo = None
-
-            if photo:
-                label_img = tk.Label(card_frame, image=photo)
-                label_img.image = photo
-                label_img.pack()
-
-            display_name = card if len(card) < 35 else card[:28] + "..." + card[card.rfind('.')-1:]
-            tk.Label(card_frame, text=display_name).pack()
-
-            var = tk.IntVar(value=count)
-            self.card_vars[card] = var
-            btn_sub = tk.Button(card_frame, text="-", command=lambda c=card: self.update_card_count(c, -1))
-            btn_sub.pack(side=tk.LEFT, padx=2)
-            entry_count = tk.Entry(card_frame, textvariable=var, width=3, justify='center')
-            entry_count.pack(side=tk.LEFT, padx=2)
-            btn_add = tk.Button(card_frame, text="+", command=lambda c=card: self.update_card_count(c, 1))
-            btn_add.pack(side=tk.LEFT, padx=2)
-
-            col += 1
-            if col >= col_count:
-                col = 0
-                row += 1
+                os.remove(tmp_path)
+            except OSError:
+                pass
+        return img
+
+    def load_thumbnail(self, card: str, mtime: float) -> Image.Image:
+        """
+        Load the preview of a card, generating it into the image cache if needed.
+        """
+        thumb_path = self.thumbnail_path(card, mtime)
+        if os.path.exists(thumb_path):
+            with Image.open(thumb_path) as img:
+                img.load()
+            return img
+        with Image.open(os.path.join(self.crop_dir, card)) as img:
+            # Let libjpeg decode at a reduced scale, then reduce() by an
+            # integer factor before the final LANCZOS pass
+            img.draft("RGB", (2 * PREVIEW_WIDTH, 2 * PREVIEW_WIDTH))
+            img.thumbnail((PREVIEW_WIDTH, 10_000), Image.Resampling.LANCZOS, reducing_gap=2.0)
+        return self.store_thumbnail(card, mtime, img)
+
+    def prune_thumbnails(self) -> None:
+        """
+        Delete cached previews of crops that have been removed or redone.
+        This is only housekeeping, so a missing or unreadable cache is skipped.
+        """
+        keep = {os.path.basename(self.thumbnail_path(card, mtime)) for card, mtime in self.scan_crops().items()}
+        try:
+            with os.scandir(self.img_cache) as it:
+                stale = [entry.path for entry in it if entry.name.endswith(".png") and entry.name not in keep]
+        except OSError:
+            return
+        for path in stale:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def thumbnail_photo(self, card: str, mtime: float) -> ImageTk.PhotoImage:
+        """
+        Return the Tk preview image of a card, reusing it across refreshes.
+        """
+        key = (card, mtime, PREVIEW_WIDTH)
+        photo = self._thumb_cache.get(key)
+        if photo is None:
+            photo = self._thumb_cache[key] = ImageTk.PhotoImage(self.load_thumbnail(card, mtime))
+        return photo
 
     def update_card_count(self, card: str, delta: int) -> None:
         """
         Update the count of a specified card.
         """
-        current = self.card_vars[card].get()
-        new_val = max(0, current + delta)
-        self.card_vars[card].set(new_val)
+        self.card_vars[card].set(max(0, self.print_dict["cards"][card] + delta))
+
+    def on_count_changed(self, card: str) -> None:
+        """
+        Store a card count changed through its buttons or typed into its entry.
+        """
+        try:
+            new_val = max(0, self.card_vars[card].get())
+        except tk.TclError:
+            # Empty or partially typed entry
+            return
+        if self.print_dict["cards"].get(card) == new_val:
+            return
         self.print_dict["cards"][card] = new_val
+        self.schedule_save()
 
     def update_paper_size(self) -> None:
         """
         Update the paper size in the project configuration.
         """
         self.print_dict["pagesize"] = self.paper_var.get()
+        self.schedule_save()
 
     def update_orientation(self) -> None:
         """
         Update the orientation in the project configuration.
         """
         self.print_dict["orient"] = self.orient_var.get()
+        self.schedule_save()
 
     def update_filename(self) -> None:
         """
         Update the PDF filename in the project configuration.
         """
         self.print_dict["filename"] = self.filename_var.get()
+        self.schedule_save()
 
     def open_config(self) -> None:
         """
         Open the configuration file for editing.
         """
         try:
-            subprocess.Popen([os.path.join(self.cwd, "config.ini")], shell=True)
+            open_file(os.path.join(self.cwd, "config.ini"))
         except Exception as e:
             messagebox.showerror("Error", str(e))
 
@@ -233,34 +426,127 @@ class PDFProxyPrinter:
         """
         Save the current project configuration to a JSON file.
         """
-        with open(self.print_json, "w") as fp:
-            json.dump(self.print_dict, fp)
+        self.write_project()
         messagebox.showinfo("Info", "Project saved.")
 
+    def write_project(self) -> None:
+        """
+        Atomically write the project configuration to print.json, skipping the
+        write if nothing changed since the last one.
+        """
+        if self._save_after is not None:
+            self.master.after_cancel(self._save_after)
+            self._save_after = None
+        payload = _dumps(self.print_dict)
+        digest = hashlib.blake2b(payload, digest_size=8).digest()
+        if digest == self._last_save_hash:
+            return
+        tmp_path = self.print_json + ".tmp"
+        with open(tmp_path, "wb") as fp:
+            fp.write(payload)
+        os.replace(tmp_path, self.print_json)
+        self._last_save_hash = digest
+
+    def schedule_save(self) -> None:
+        """
+        Write the project configuration shortly after the last change, so a
+        burst of clicks or keystrokes results in a single write.
+        """
+        if self._save_after is not None:
+            self.master.after_cancel(self._save_after)
+        self._save_after = self.master.after(300, self.write_project)
+
+    def on_close(self) -> None:
+        """
+        Save pending changes before closing the window.
+        """
+        if self._save_after is not None:
+            self.write_project()
+        self.master.destroy()
+
     def run_cropper(self) -> None:
         """
-        Run the cropper to process images.
+        Run the cropper on a worker thread to process images.
         """
-        wait_win = tk.Toplevel(self.master)
-        wait_win.title("Please Wait")
-        tk.Label(wait_win, text="Cropping...").pack(padx=20, pady=20)
-        self.master.update()
-        crop_images(self.image_dir, self.crop_dir, self.cfg)
-        # Add any new images to the project configuration.
-        for img in os.listdir(self.crop_dir):
-            if img not in self.print_dict["cards"]:
-                self.print_dict["cards"][img] = 1
-        wait_win.destroy()
+        cache_path = os.path.join(self.img_cache, "crops.json")
+        self.run_worker("Cropping...", crop_images, (self.image_dir, self.crop_dir, self.cfg, cache_path),
+                        self.on_crop_done)
+
+    def on_crop_done(self, previews: dict) -> None:
+        """
+        Add the images the cropper just wrote to the project configuration.
+        The previews it made of them are cached, so they are not decoded again.
+        """
+        for img in previews:
+            self.print_dict["cards"].setdefault(img, 1)
+        if previews:
+            self.schedule_save()
+        crops = self.scan_crops()
+        for card, data in previews.items():
+            if data is None or card not in crops:
+                # Left to load_thumbnail when the tile is drawn
+                continue
+            try:
+                with Image.open(BytesIO(data)) as img:
+                    img.load()
+                img = self.store_thumbnail(card, crops[card], img)
+            except Exception:
+                continue
+            # PhotoImages belong to the Tk thread, so they are only built here
+            self._thumb_cache[(card, crops[card], PREVIEW_WIDTH)] = ImageTk.PhotoImage(img)
         self.refresh_cards()
+        self.prune_thumbnails()
 
     def render_pdf(self) -> None:
         """
-        Render the final PDF document using the current project configuration.
+        Render the final PDF document on a worker thread using the current project configuration.
+        """
+        # Hand the worker a snapshot so count edits during rendering are safe
+        p_dict = dict(self.print_dict, cards=dict(self.print_dict["cards"]))
+        size = self.SIZE_MAP.get(p_dict.get("pagesize"), letter)
+        max_dpi = self.cfg.getint("Max.DPI", fallback=300)
+        self.run_worker("Rendering PDF...", pdf_gen, (p_dict, size, max_dpi), self.on_render_done)
+
+    def on_render_done(self, pdf_fp: str) -> None:
+        """
+        Let the user know the PDF has been written.
+        """
+        show_popup(f"Saved {os.path.basename(pdf_fp)}", duration=2000)
+
+    def run_worker(self, message: str, target, args: tuple, on_done) -> None:
+        """
+        Run target(*args) on a worker thread behind a modal "Please Wait" window.
+        The result is handed back through a queue and passed to on_done on the
+        Tk thread; an exception is shown in an error box instead.
         """
         wait_win = tk.Toplevel(self.master)
         wait_win.title("Please Wait")
-        tk.Label(wait_win, text="Rendering PDF...").pack(padx=20, pady=20)
-        self.master.update()
-        size_map = {"Letter": letter, "A4": A4, "Legal": legal}
-        pdf_gen(self.print_dict, size_map[self.print_dict["pagesize"]])
+        tk.Label(wait_win, text=message).pack(padx=20, pady=20)
+        wait_win.grab_set()
+
+        results = queue.Queue()
+
+        def work() -> None:
+            try:
+                results.put((True, target(*args)))
+            except Exception as e:
+                results.put((False, e))
+
+        threading.Thread(target=work, daemon=True).start()
+        self.master.after(50, self.poll_worker, results, wait_win, on_done)
+
+    def poll_worker(self, results: queue.Queue, wait_win: tk.Toplevel, on_done) -> None:
+        """
+        Check for a worker result from the Tk event loop, closing the wait window
+        once it arrives.
+        """
+        try:
+            ok, value = results.get_nowait()
+        except queue.Empty:
+            self.master.after(50, self.poll_worker, results, wait_win, on_done)
+            return
         wait_win.destroy()
+        if ok:
+            on_done(value)
+        else:
+            messagebox.showerror("Error", str(value))
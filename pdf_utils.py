@@ -1,13 +1,44 @@
 import os
 import re
 import subprocess
+import sys
 import tkinter as tk
+from io import BytesIO
+from PIL import Image
+from reportlab.lib.utils import ImageReader
 from reportlab.pdfgen import canvas
 
+_BASE_DIR = os.path.dirname(__file__)
+_CROP_DIR = os.path.join(_BASE_DIR, "images", "crop")
+
+# Command that opens a file with its default application; Windows uses os.startfile.
+_OPENER = None if sys.platform.startswith("win") else "open" if sys.platform == "darwin" else "xdg-open"
+
+# Characters stripped from the PDF file name.
+_FILENAME_CLEAN = re.compile(r"\W")
+
+
+def open_file(path: str) -> None:
+    """
+    Open a file with the system's default application without waiting for it.
+
+    Parameters:
+        path (str): The file to open.
+    """
+    if _OPENER is None:
+        os.startfile(path)
+        return
+    # Detach the viewer so it neither inherits Tk's stdio nor dies with it
+    subprocess.Popen([_OPENER, path], stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                     stderr=subprocess.DEVNULL, start_new_session=True)
+
 
 def show_popup(message: str, duration: int = 2000) -> None:
     """
-    Display a modal popup window with a given message that auto-closes after a specified duration.
+    Display a popup window with a given message that auto-closes after a specified duration.
+
+    The popup is neither modal nor waited on, so the caller returns to the
+    Tk event loop right away.
 
     Parameters:
         message (str): The message to display.
@@ -18,84 +49,136 @@ def show_popup(message: str, duration: int = 2000) -> None:
     tk.Label(popup, text=message, padx=20, pady=20).pack()
     # Auto-close the popup after 'duration' milliseconds
     popup.after(duration, popup.destroy)
-    popup.grab_set()
-    popup.wait_window()
 
 
-def draw_cross(can: canvas.Canvas, x: float, y: float, c: int = 6, s: int = 1) -> None:
+def draw_crosses(can: canvas.Canvas, points: list, c: int = 6, s: int = 1) -> None:
     """
-    Draw a cross marker at the specified coordinates on a canvas.
+    Draw cross markers at all of the given coordinates on a canvas.
+
+    Each line is dashed alternately white and black so it shows up on both
+    light and dark cards. All lines sharing a color and dash phase are batched
+    into one path, so the canvas state changes a fixed number of times no
+    matter how many crosses are drawn.
 
     Parameters:
         can (canvas.Canvas): The canvas to draw on.
-        x (float): The x-coordinate.
-        y (float): The y-coordinate.
+        points (list): The (x, y) coordinates of the crosses.
         c (int, optional): The half-length of the cross lines. Defaults to 6.
         s (int, optional): The stroke width. Defaults to 1.
     """
+    def vertical(path, x, y):
+        path.moveTo(x, y - c)
+        path.lineTo(x, y + c)
+
+    def horizontal(path, x, y):
+        path.moveTo(x - c, y)
+        path.lineTo(x + c, y)
+
     dash = [s, s]
     can.setLineWidth(s)
-    can.setDash(dash)
-    can.setStrokeColorRGB(255, 255, 255)
-    can.line(x, y - c, x, y + c)
-    can.setStrokeColorRGB(0, 0, 0)
-    can.line(x - c, y, x + c, y)
-    can.setDash(dash, s)
-    can.setStrokeColorRGB(255, 255, 255)
-    can.line(x - c, y, x + c, y)
-    can.setStrokeColorRGB(0, 0, 0)
-    can.line(x, y - c, x, y + c)
-
-
-def pdf_gen(p_dict: dict, size: tuple) -> None:
+    # Dash phase 0: white verticals and black horizontals, then phase s: the
+    # opposite colors fill in the gaps
+    for phase, white_line, black_line in ((0, vertical, horizontal), (s, horizontal, vertical)):
+        can.setDash(dash, phase)
+        for color, line in (((1, 1, 1), white_line), ((0, 0, 0), black_line)):
+            path = can.beginPath()
+            for x, y in points:
+                line(path, x, y)
+            can.setStrokeColorRGB(*color)
+            can.drawPath(path, stroke=1, fill=0)
+
+
+def card_reader(img_path: str, max_width: int | None = None) -> ImageReader:
+    """
+    Open a card image for embedding in the PDF.
+
+    ReportLab embeds JPEG data as is, but stores every other format as
+    deflated raw RGB. Those cards are encoded to JPEG once up front so the PDF
+    carries compact JPEG data for them too. Cards more than 5% wider than
+    max_width are scaled down first, since the extra pixels would never be
+    printed. The margin covers the few pixels the cropper's rounding can add,
+    so its crops keep their original JPEG data.
+
+    Parameters:
+        img_path (str): Path of the card image.
+        max_width (int | None): Widest the embedded image needs to be, in pixels.
+
+    Returns:
+        ImageReader: A reader over JPEG data for the card.
+    """
+    with Image.open(img_path) as im:
+        oversized = max_width is not None and im.width > max_width * 1.05
+        if im.format == "JPEG" and not oversized:
+            return ImageReader(img_path)
+        if oversized:
+            im.draft("RGB", (max_width, max_width))
+            im = im.resize((max_width, round(im.height * max_width / im.width)), Image.Resampling.LANCZOS)
+        buf = BytesIO()
+        im.convert("RGB").save(buf, "JPEG", quality=92, optimize=True)
+    buf.seek(0)
+    return ImageReader(buf)
+
+
+def pdf_gen(p_dict: dict, size: tuple, max_dpi: int | None = None) -> str:
     """
     Generate a PDF document from the project dictionary and specified page size.
 
+    This does not touch Tk, so it can run on a worker thread.
+
     Parameters:
         p_dict (dict): Project configuration containing card details.
         size (tuple): The paper size as a tuple (width, height).
+        max_dpi (int | None): Print resolution above which cards are scaled
+            down before embedding. Defaults to embedding them as they are.
+
+    Returns:
+        str: The path of the written PDF.
     """
-    rgx = re.compile(r"\W")
     img_dict = p_dict["cards"]
     # Card dimensions in points (1 inch = 72 points)
     w, h = 2.48 * 72, 3.46 * 72
     rotate = (p_dict["orient"] == "Landscape")
     size = tuple(size[::-1]) if rotate else size
     pw, ph = size
-    pdf_fp = os.path.join(
-        os.path.dirname(__file__),
-        f"{re.sub(rgx, '', p_dict['filename'])}.pdf" if len(p_dict["filename"]) > 0 else "_printme.pdf",
-    )
-    pages = canvas.Canvas(pdf_fp, pagesize=size)
+    pdf_fp = os.path.join(_BASE_DIR, f"{_FILENAME_CLEAN.sub('', p_dict['filename']) or '_printme'}.pdf")
+    pages = canvas.Canvas(pdf_fp, pagesize=size, pageCompression=1, invariant=1)
     cols, rows = int(pw // w), int(ph // h)
     rx, ry = round((pw - (w * cols)) / 2), round((ph - (h * rows)) / 2)
-    total_cards = sum(img_dict.values())
     pbreak = cols * rows
-    i = 0
-
-    for img in img_dict.keys():
-        img_path = os.path.join(os.path.dirname(__file__), "images", "crop", img)
-        for _ in range(img_dict[img]):
-            p, j = divmod(i, pbreak)
-            y_idx, x_idx = divmod(j, cols)
-            if j == 0 and i > 0:
-                pages.showPage()
-            pages.drawImage(
-                img_path,
-                x_idx * w + rx,
-                y_idx * h + ry,
-                w,
-                h,
-            )
-            if j == pbreak - 1 or i == total_cards - 1:
-                for cy in range(rows + 1):
-                    for cx in range(cols + 1):
-                        draw_cross(pages, rx + w * cx, ry + h * cy)
-            i += 1
-
-    show_popup("Saving PDF...", duration=2000)
+    positions = [(rx + w * cx, ry + h * cy) for cy in range(rows) for cx in range(cols)]
+
+    max_width = None if max_dpi is None else round(w / 72 * max_dpi)
+    # Register each card once as a form XObject so every copy is just a reference
+    forms = {}
+    for n, img in enumerate(img for img, count in img_dict.items() if count > 0):
+        img_path = os.path.join(_CROP_DIR, img)
+        forms[img] = f"card{n}"
+        pages.beginForm(forms[img])
+        pages.drawImage(card_reader(img_path, max_width), 0, 0, w, h)
+        pages.endForm()
+
+    # Every page shares the same crop marks
+    cross_pts = [(rx + w * cx, ry + h * cy) for cy in range(rows + 1) for cx in range(cols + 1)]
+
+    def finish_page() -> None:
+        draw_crosses(pages, cross_pts)
+
+    sequence = [forms[img] for img, count in img_dict.items() for _ in range(count)]
+    for i, form in enumerate(sequence):
+        j = i % pbreak
+        if j == 0 and i > 0:
+            finish_page()
+            pages.showPage()
+        pages.saveState()
+        pages.translate(*positions[j])
+        pages.doForm(form)
+        pages.restoreState()
+    if sequence:
+        finish_page()
+
     pages.save()
     try:
-        subprocess.Popen(["xdg-open", pdf_fp])
+        open_file(pdf_fp)
     except Exception as e:
         print(e)
+    return pdf_fp